@@ -12,30 +12,49 @@ Author: TanBQ.
 from __future__ import annotations
 
 import argparse
+import asyncio
 import csv
+import hashlib
 import html
+import json
+import os
+import random
 import re
-import shutil
 from dataclasses import dataclass
 from datetime import date, datetime
+from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence, Tuple
+from typing import Any, BinaryIO, Dict, FrozenSet, List, Optional, Sequence, Tuple
 from urllib.parse import urlparse
 
 import httpx
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import Environment, FileSystemLoader
 from tqdm import tqdm
 
 VERSION = "1.0.0-Standard"
 COPYRIGHT = "@Copyright (C) 2020 - {year} by TanBQ."
 DEFAULT_ALLOW_HOSTS = ("pbs.twimg.com", "video.twimg.com")
 DEFAULT_CONCURRENCY = 4
+USER_AGENT = "tweetpdf-standard/1.0"
+RETRY_STATUS = (429, 500, 502, 503, 504)
+MAX_BACKOFF = 30.0
 
 CAND_CREATED_AT = ("Created At", "created_at", "Date", "date", "Time", "time")
 CAND_TEXT = ("Text", "text", "Full Text", "full_text", "Content", "content")
 CAND_URL = ("Tweet URL", "tweet_url", "URL", "url", "Link", "link")
 CAND_MEDIA_URLS = ("media_urls", "Media URLs", "media", "images", "image_urls")
 
+# Large reads cut syscalls on big exports; long tweet/media cells must not trip
+# the csv module's 128 KiB default field limit.
+CSV_READ_BUFFER = 1 << 20
+csv.field_size_limit(1 << 20)
+
+_MEDIA_SPLIT_RE = re.compile(r"[\r\n]+|[;,]\s*")
+_SAFE_ID_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+_EXT_RE = re.compile(r"\.([A-Za-z0-9]{2,5})$")
+_URL_PREFIXES = ("http://", "https://")
+
 
 @dataclass(frozen=True)
 class FontSpec:
@@ -43,30 +62,39 @@ class FontSpec:
     filename: str
     format_hint: str
     url: str
+    size: int
+    sha256: str
+
 
+FONT_MANIFEST = ".manifest.json"
 
+# URLs point at immutable release tags, never a moving branch, so the pinned
+# size/sha256 (those of the bundled files) keep matching what is downloaded.
 FONT_SPECS: Tuple[FontSpec, ...] = (
     FontSpec(
         family="Noto Sans",
         filename="NotoSans-Regular.ttf",
         format_hint="truetype",
-        url="https://raw.githubusercontent.com/notofonts/noto-fonts/main/hinted/ttf/NotoSans/NotoSans-Regular.ttf",
+        url="https://raw.githubusercontent.com/notofonts/notofonts.github.io/NotoSans-v2.008/fonts/NotoSans/hinted/ttf/NotoSans-Regular.ttf",
+        size=569208,
+        sha256="b85c38ecea8a7cfb39c24e395a4007474fa5a4fc864f6ee33309eb4948d232d5",
     ),
     FontSpec(
         family="Noto Sans CJK SC",
         filename="NotoSansCJKsc-Regular.otf",
         format_hint="opentype",
-        url="https://raw.githubusercontent.com/notofonts/noto-cjk/main/Sans/OTF/SimplifiedChinese/NotoSansCJKsc-Regular.otf",
+        url="https://raw.githubusercontent.com/notofonts/noto-cjk/Sans2.004/Sans/OTF/SimplifiedChinese/NotoSansCJKsc-Regular.otf",
+        size=16437364,
+        sha256="2c76254f6fc379fddfce0a7e84fb5385bb135d3e399294f6eeb6680d0365b74b",
     ),
 )
 
 
-@dataclass
+@dataclass(slots=True)
 class TweetRow:
     tweet_id: str
     created_at: datetime
     text: str
-    text_html: str
     url: str
     media_urls: List[str]
     media_files: List[str]
@@ -89,64 +117,84 @@ def _pick_col(header: Sequence[str], candidates: Sequence[str]) -> Optional[str]
 
 
 def _parse_datetime(raw: str) -> datetime:
-    s = (raw or "").strip()
+    return _parse_datetime_cached((raw or "").strip())
+
+
+@lru_cache(maxsize=8192)
+def _parse_datetime_cached(s: str) -> datetime:
+    # Exports often repeat timestamps; datetime is immutable, so results are shared.
+    # fromisoformat (C-implemented, Python 3.11+) covers the usual export formats;
+    # strptime only handles the non-zero-padded stragglers.
+    try:
+        return datetime.fromisoformat(s)
+    except ValueError:
+        pass
     for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
         try:
             return datetime.strptime(s, fmt)
         except ValueError:
             pass
-    try:
-        return datetime.fromisoformat(s)
-    except Exception as exc:
-        raise ValueError(f"Unsupported datetime format: {s!r}") from exc
+    raise ValueError(f"Unsupported datetime format: {s!r}")
 
 
 def _parse_media_urls(cell: str) -> List[str]:
     if not cell:
         return []
-    parts = re.split(r"[\r\n]+|[;,]\s*", str(cell).strip())
+    parts = _MEDIA_SPLIT_RE.split(str(cell).strip())
     out: List[str] = []
     for p in parts:
         p = p.strip()
-        if p.startswith("http://") or p.startswith("https://"):
+        if p.startswith(_URL_PREFIXES):
             out.append(p)
     return out
 
 
 def _safe_tweet_id(value: str, fallback: str = "tweet") -> str:
-    cleaned = re.sub(r"[^A-Za-z0-9_.-]+", "_", (value or "").strip())[:80].strip("._")
+    cleaned = _SAFE_ID_RE.sub("_", (value or "").strip())[:80].strip("._")
     return cleaned or fallback
 
 
-def _safe_ext_from_url(url: str) -> str:
-    path = urlparse(url).path
-    m = re.search(r"\.([A-Za-z0-9]{2,5})$", path)
+def _safe_ext_from_path(path: str) -> str:
+    m = _EXT_RE.search(path)
     return "." + m.group(1).lower() if m else ".bin"
 
 
-def _allowed_host(url: str, allow_hosts: Sequence[str]) -> bool:
-    try:
-        host = (urlparse(url).hostname or "").lower()
-    except Exception:
-        return False
-    return any(host == h.lower() or host.endswith("." + h.lower()) for h in allow_hosts)
+def _allowed_host(host: str, exact_hosts: FrozenSet[str], host_suffixes: Tuple[str, ...]) -> bool:
+    return host in exact_hosts or host.endswith(host_suffixes)
 
 
 def _text_to_html(text: str) -> str:
     # Safe rendering: unescape already happened in CSV parsing.
-    return html.escape(text or "").replace("\r\n", "\n").replace("\r", "\n").replace("\n", "<br>")
+    s = text or ""
+    if "\r" in s:
+        s = s.replace("\r\n", "\n").replace("\r", "\n")
+    return html.escape(s).replace("\n", "<br>")
+
+
+@lru_cache(maxsize=4096)
+def _text_to_html_cached(text: str) -> str:
+    # Retweets and boilerplate replies repeat the same text; render it once.
+    return _text_to_html(text)
+
+
+def _col_index(header: Sequence[str], positions: Dict[str, int], candidates: Sequence[str]) -> int:
+    col = _pick_col(header, candidates)
+    return positions[col] if col is not None else -1
 
 
 def _read_rows(csv_path: Path) -> List[TweetRow]:
-    with csv_path.open("r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-        header = reader.fieldnames or []
-        col_dt = _pick_col(header, CAND_CREATED_AT)
-        col_text = _pick_col(header, CAND_TEXT)
-        col_url = _pick_col(header, CAND_URL)
-        col_media = _pick_col(header, CAND_MEDIA_URLS)
-
-        if not col_dt or not col_text or not col_url:
+    with csv_path.open("r", encoding="utf-8-sig", newline="", buffering=CSV_READ_BUFFER) as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        # Last occurrence wins for duplicate names, as with DictReader and _pick_col.
+        positions = {h: i for i, h in enumerate(header)}
+        i_dt = _col_index(header, positions, CAND_CREATED_AT)
+        i_text = _col_index(header, positions, CAND_TEXT)
+        i_url = _col_index(header, positions, CAND_URL)
+        i_media = _col_index(header, positions, CAND_MEDIA_URLS)
+        i_ids = [positions[name] for name in ("ID", "id") if name in positions]
+
+        if i_dt < 0 or i_text < 0 or i_url < 0:
             raise SystemExit(
                 "Could not find required columns.\n"
                 f"Header={header}\n"
@@ -155,7 +203,8 @@ def _read_rows(csv_path: Path) -> List[TweetRow]:
 
         rows: List[TweetRow] = []
         for row in reader:
-            dt_raw = (row.get(col_dt, "") or "").strip()
+            n = len(row)
+            dt_raw = row[i_dt].strip() if i_dt < n else ""
             if not dt_raw:
                 continue
             try:
@@ -163,17 +212,16 @@ def _read_rows(csv_path: Path) -> List[TweetRow]:
             except Exception:
                 continue
 
-            text = html.unescape(row.get(col_text, "") or "")
-            url = (row.get(col_url, "") or "").strip()
-            tweet_id = str(row.get("ID") or row.get("id") or "").strip() or url.rstrip("/").split("/")[-1]
-            tweet_id = _safe_tweet_id(tweet_id)
-            media_urls = _parse_media_urls(row.get(col_media, "") if col_media else "")
+            text = html.unescape(row[i_text]) if i_text < n else ""
+            url = row[i_url].strip() if i_url < n else ""
+            tweet_id = next((row[i] for i in i_ids if i < n and row[i]), "").strip()
+            tweet_id = _safe_tweet_id(tweet_id or url.rstrip("/").split("/")[-1])
+            media_urls = _parse_media_urls(row[i_media]) if 0 <= i_media < n else []
             rows.append(
                 TweetRow(
                     tweet_id=tweet_id,
                     created_at=created_at,
                     text=text,
-                    text_html="",
                     url=url,
                     media_urls=media_urls,
                     media_files=[],
@@ -211,12 +259,57 @@ def _filter_rows(rows: Sequence[TweetRow], start: Optional[date], end: Optional[
     return out
 
 
-def _download_media(
+def _retry_delay(backoff: float, retry_after: Optional[str] = None) -> float:
+    # Honour a seconds-form Retry-After (capped), and add jitter so concurrent
+    # workers that hit the same 429/5xx do not retry in lockstep.
+    delay = backoff
+    if retry_after:
+        try:
+            delay = min(max(float(retry_after), 0.0), MAX_BACKOFF)
+        except ValueError:
+            pass
+    return delay + random.uniform(0, backoff * 0.5)
+
+
+def _content_length(headers: httpx.Headers) -> int:
+    # A malformed header means "length unknown"; streaming still enforces max_bytes.
+    try:
+        return max(int(headers.get("Content-Length") or 0), 0)
+    except ValueError:
+        return 0
+
+
+def _preallocate(fp: BinaryIO, size: int) -> None:
+    # Reserve the file's extents up front; not every platform/filesystem supports it.
+    try:
+        os.posix_fallocate(fp.fileno(), 0, size)
+    except (AttributeError, OSError):
+        pass
+
+
+def _make_async_client(concurrency: int = DEFAULT_CONCURRENCY, timeout_s: float = 20.0) -> httpx.AsyncClient:
+    # One client per run: HTTP/2 connections to the media hosts stay alive and multiplex all downloads.
+    limits = httpx.Limits(
+        max_connections=concurrency,
+        max_keepalive_connections=concurrency,
+        keepalive_expiry=30.0,
+    )
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(timeout_s),
+        limits=limits,
+        follow_redirects=True,
+        headers={"User-Agent": USER_AGENT},
+    )
+
+
+async def _download_media(
+    client: httpx.AsyncClient,
     rows: Sequence[TweetRow],
     media_cache_dir: Path,
-    allow_hosts: Sequence[str],
+    exact_hosts: FrozenSet[str],
+    host_suffixes: Tuple[str, ...],
     concurrency: int = DEFAULT_CONCURRENCY,
-    timeout_s: float = 20.0,
     max_bytes: int = 10 * 1024 * 1024,
 ) -> None:
     media_cache_dir.mkdir(parents=True, exist_ok=True)
@@ -224,9 +317,15 @@ def _download_media(
     tasks: List[Tuple[TweetRow, str, Path]] = []
     for t in rows:
         for i, url in enumerate(t.media_urls):
-            if not _allowed_host(url, allow_hosts):
+            # Parse once: the host feeds the allowlist, the path feeds the extension.
+            try:
+                parsed = urlparse(url)
+                host = (parsed.hostname or "").lower()
+            except Exception:
                 continue
-            out = media_cache_dir / f"{t.tweet_id}_{i:02d}{_safe_ext_from_url(url)}"
+            if not _allowed_host(host, exact_hosts, host_suffixes):
+                continue
+            out = media_cache_dir / f"{t.tweet_id}_{i:02d}{_safe_ext_from_path(parsed.path)}"
             tasks.append((t, url, out))
 
     if not tasks:
@@ -235,91 +334,178 @@ def _download_media(
 
     print(f"[4/6] Downloading media ({len(tasks)} files, concurrency={concurrency})...")
     pbar = tqdm(total=len(tasks), desc="Downloading media", unit="file")
-    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
-    timeout = httpx.Timeout(timeout_s)
-
-    async def runner() -> None:
-        import asyncio
 
-        async with httpx.AsyncClient(timeout=timeout, limits=limits, follow_redirects=True) as client:
-            sem = asyncio.Semaphore(concurrency)
-
-            async def fetch_one(t: TweetRow, url: str, out: Path) -> None:
+    async def fetch_one(t: TweetRow, url: str, out: Path) -> None:
+        try:
+            if out.exists() and out.stat().st_size > 0:
+                t.media_files.append(out.as_uri())
+                return
+
+            # Stream into a .part file so oversized bodies are dropped mid-transfer
+            # and a failed download never leaves a truncated file under the final name.
+            tmp = out.with_suffix(out.suffix + ".part")
+            backoff = 1.0
+            for attempt in range(4):
+                retry_after: Optional[str] = None
                 try:
-                    if out.exists() and out.stat().st_size > 0:
-                        t.media_files.append(out.resolve().as_uri())
+                    async with client.stream("GET", url) as r:
+                        if r.status_code in RETRY_STATUS:
+                            retry_after = r.headers.get("Retry-After")
+                            raise RuntimeError(f"HTTP {r.status_code}")
+                        if r.status_code != 200:
+                            return
+                        content_length = _content_length(r.headers)
+                        if content_length > max_bytes:
+                            return
+                        total = 0
+                        with tmp.open("wb") as fp:
+                            if content_length > 0:
+                                _preallocate(fp, content_length)
+                            async for chunk in r.aiter_bytes(64 * 1024):
+                                total += len(chunk)
+                                if total > max_bytes:
+                                    break
+                                fp.write(chunk)
+                            if total < content_length:
+                                fp.truncate(total)
+                    if total == 0 or total > max_bytes:
+                        tmp.unlink(missing_ok=True)
+                        return
+                    tmp.replace(out)
+                    t.media_files.append(out.as_uri())
+                    return
+                except Exception:
+                    tmp.unlink(missing_ok=True)
+                    if attempt == 3:
                         return
+                    await asyncio.sleep(_retry_delay(backoff, retry_after))
+                    backoff = min(backoff * 2, MAX_BACKOFF)
+        finally:
+            pbar.update(1)
 
-                    backoff = 1.0
-                    for attempt in range(4):
-                        try:
-                            async with sem:
-                                r = await client.get(url, headers={"User-Agent": "tweetpdf-standard/1.0"})
-                            if r.status_code == 200 and r.content:
-                                if len(r.content) > max_bytes:
-                                    return
-                                out.write_bytes(r.content)
-                                t.media_files.append(out.resolve().as_uri())
-                                return
-                            if r.status_code in (429, 500, 502, 503, 504):
-                                raise RuntimeError(f"HTTP {r.status_code}")
-                            return
-                        except Exception:
-                            if attempt == 3:
-                                return
-                            await asyncio.sleep(backoff)
-                            backoff *= 2
-                finally:
-                    pbar.update(1)
+    # A fixed pool of workers drains a bounded queue, so the number of live
+    # coroutines stays at `concurrency` no matter how many files there are.
+    queue: asyncio.Queue[Optional[Tuple[TweetRow, str, Path]]] = asyncio.Queue(maxsize=concurrency * 4)
+
+    async def produce() -> None:
+        for job in tasks:
+            await queue.put(job)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def worker() -> None:
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            await fetch_one(*job)
+
+    await asyncio.gather(produce(), *[worker() for _ in range(concurrency)])
+    pbar.close()
 
-            await asyncio.gather(*[fetch_one(t, url, out) for (t, url, out) in tasks])
-            pbar.close()
 
-    import asyncio
+def _load_font_manifest(font_dir: Path) -> Dict[str, Any]:
+    try:
+        data = json.loads((font_dir / FONT_MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
 
-    asyncio.run(runner())
+def _save_font_manifest(font_dir: Path, manifest: Dict[str, Any]) -> None:
+    (font_dir / FONT_MANIFEST).write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
 
 
-def _ensure_fonts(font_dir: Path, timeout_s: float = 30.0) -> List[Dict[str, str]]:
+def _font_ok(font_dir: Path, spec: FontSpec, manifest: Dict[str, Any]) -> bool:
+    path = font_dir / spec.filename
+    try:
+        size = path.stat().st_size
+    except OSError:
+        return False
+    # A size mismatch (e.g. a truncated download) fails without hashing anything.
+    if size != spec.size:
+        return False
+    # Warm path: the file was already verified against the expected digest.
+    entry = manifest.get(spec.filename)
+    if isinstance(entry, dict) and entry.get("size") == size and entry.get("sha256") == spec.sha256:
+        return True
+    with path.open("rb") as fp:
+        digest = hashlib.file_digest(fp, "sha256").hexdigest()
+    if digest != spec.sha256:
+        return False
+    manifest[spec.filename] = {"size": size, "sha256": digest}
+    return True
+
+
+async def _fetch_font(
+    client: httpx.AsyncClient,
+    spec: FontSpec,
+    font_dir: Path,
+    manifest: Dict[str, Any],
+    timeout_s: float,
+) -> Optional[str]:
+    # Returns None on success, otherwise the reason the font could not be fetched.
+    out = font_dir / spec.filename
+    tmp = out.with_suffix(out.suffix + ".part")
+    backoff = 1.0
+    for attempt in range(4):
+        retry_after: Optional[str] = None
+        try:
+            resp = await client.get(spec.url, timeout=timeout_s)
+            if resp.status_code == 200 and resp.content:
+                digest = hashlib.sha256(resp.content).hexdigest()
+                # The pinned file will not change on retry, so a mismatch is final.
+                if len(resp.content) != spec.size or digest != spec.sha256:
+                    return "checksum mismatch"
+                tmp.write_bytes(resp.content)
+                tmp.replace(out)
+                manifest[spec.filename] = {"size": spec.size, "sha256": digest}
+                return None
+            if resp.status_code in RETRY_STATUS:
+                retry_after = resp.headers.get("Retry-After")
+                raise RuntimeError(f"HTTP {resp.status_code}")
+            return "empty response" if resp.status_code == 200 else f"HTTP {resp.status_code}"
+        except Exception as exc:
+            tmp.unlink(missing_ok=True)
+            if attempt == 3:
+                return str(exc) or type(exc).__name__
+            await asyncio.sleep(_retry_delay(backoff, retry_after))
+            backoff = min(backoff * 2, MAX_BACKOFF)
+    return "download failed"
+
+
+async def _ensure_fonts(client: httpx.AsyncClient, font_dir: Path, timeout_s: float = 30.0) -> List[Dict[str, str]]:
     print("[1/6] Checking fonts...")
     font_dir.mkdir(parents=True, exist_ok=True)
-    missing = [spec for spec in FONT_SPECS if not (font_dir / spec.filename).exists()]
+    manifest = _load_font_manifest(font_dir)
+    recorded = dict(manifest)
+    missing = [spec for spec in FONT_SPECS if not _font_ok(font_dir, spec, manifest)]
     if missing:
         print(f"[2/6] Downloading missing fonts ({len(missing)})...")
         pbar = tqdm(total=len(missing), desc="Downloading fonts", unit="font")
-        with httpx.Client(timeout=timeout_s, follow_redirects=True) as client:
-            for spec in missing:
-                ok = False
-                backoff = 1.0
-                for attempt in range(4):
-                    try:
-                        resp = client.get(spec.url, headers={"User-Agent": "tweetpdf-standard/1.0"})
-                        if resp.status_code == 200 and resp.content:
-                            (font_dir / spec.filename).write_bytes(resp.content)
-                            ok = True
-                            break
-                        if resp.status_code in (429, 500, 502, 503, 504):
-                            raise RuntimeError(f"HTTP {resp.status_code}")
-                        break
-                    except Exception:
-                        if attempt == 3:
-                            break
-                        import time
-
-                        time.sleep(backoff)
-                        backoff *= 2
+
+        async def fetch_and_count(spec: FontSpec) -> Optional[str]:
+            try:
+                return await _fetch_font(client, spec, font_dir, manifest, timeout_s)
+            finally:
                 pbar.update(1)
-                if not ok:
-                    pbar.close()
-                    raise SystemExit(f"Failed to download font: {spec.filename}")
+
+        results = await asyncio.gather(*[fetch_and_count(spec) for spec in missing])
         pbar.close()
     else:
         print("[2/6] Fonts already present.")
+        results = []
+
+    if manifest != recorded:
+        _save_font_manifest(font_dir, manifest)
+    for spec, error in zip(missing, results):
+        if error is not None:
+            raise SystemExit(f"Failed to download font: {spec.filename} ({error})")
 
     return [
         {
             "family": spec.family,
-            "src": (font_dir / spec.filename).resolve().as_uri(),
+            "src": (font_dir / spec.filename).as_uri(),
             "format": spec.format_hint,
         }
         for spec in FONT_SPECS
@@ -328,7 +514,15 @@ def _ensure_fonts(font_dir: Path, timeout_s: float = 30.0) -> List[Dict[str, str
 
 def _render_pdf(rows: Sequence[TweetRow], out_pdf: Path, template_dir: Path, font_faces: Sequence[Dict[str, str]]) -> None:
     print("[5/6] Rendering PDF...")
-    env = Environment(loader=FileSystemLoader(str(template_dir)), autoescape=select_autoescape(["html", "xml"]))
+    # Autoescape is off: the template escapes CSV-derived fields explicitly, and the
+    # remaining values (dates, file URIs, font faces) are generated here and already safe.
+    env = Environment(
+        loader=FileSystemLoader(str(template_dir)),
+        autoescape=False,
+        auto_reload=False,
+        cache_size=64,
+    )
+    env.filters["text_to_html"] = _text_to_html_cached
     tpl = env.get_template("template.html")
     html_str = tpl.render(
         title="Tweet Export (Standard)",
@@ -352,16 +546,39 @@ def _format_size(total_bytes: int) -> str:
 def _remove_cache(cache_root: Path) -> Tuple[int, int]:
     if not cache_root.exists():
         return 0, 0
+    # Single pass: size each entry from its scandir stat, unlink it right away,
+    # then remove the emptied directories deepest-first.
     files = 0
     bytes_total = 0
-    for p in cache_root.rglob("*"):
-        if p.is_file():
-            files += 1
-            try:
-                bytes_total += p.stat().st_size
-            except OSError:
-                pass
-    shutil.rmtree(cache_root, ignore_errors=True)
+    stack = [str(cache_root)]
+    dirs: List[str] = []
+    while stack:
+        path = stack.pop()
+        dirs.append(path)
+        try:
+            it = os.scandir(path)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    if entry.is_file(follow_symlinks=False):
+                        files += 1
+                        bytes_total += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    pass
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+    for path in reversed(dirs):
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
     return files, bytes_total
 
 
@@ -393,7 +610,12 @@ def main() -> None:
     template_dir = root_dir / "templates"
 
     if args.init:
-        _ensure_fonts(font_dir)
+
+        async def _run_init() -> None:
+            async with _make_async_client() as client:
+                await _ensure_fonts(client, font_dir)
+
+        asyncio.run(_run_init())
         print("Init complete: fonts and templates are ready.")
         return
 
@@ -407,24 +629,35 @@ def main() -> None:
     csv_path = Path(args.csv).expanduser().resolve()
     out_pdf = Path(args.out).expanduser().resolve() if args.out else csv_path.with_suffix(".pdf")
     cache_root = Path(args.download_dir).expanduser().resolve()
+    # cache_root and root_dir are resolved here, so every child path is already
+    # absolute and can be turned into a file:// URI without another resolve().
     media_cache = cache_root / "media"
-    allow_hosts = [h.strip() for h in str(args.allow_hosts).split(",") if h.strip()]
-    font_faces = _ensure_fonts(font_dir)
-
-    print("[3/6] Reading CSV and preparing rows...")
-    rows = _read_rows(csv_path)
-    rows = _filter_rows(rows, start_d, end_d)
-    rows.sort(key=lambda r: r.created_at, reverse=(args.sort == "desc"))
-    for t in rows:
-        t.text_html = _text_to_html(t.text)
-    print(f"Tweets in output scope: {len(rows)}")
+    allow_hosts = [h.strip().lower() for h in str(args.allow_hosts).split(",") if h.strip()]
+    exact_hosts = frozenset(allow_hosts)
+    host_suffixes = tuple("." + h for h in allow_hosts)
+
+    async def _run_all() -> Tuple[List[Dict[str, str]], List[TweetRow]]:
+        # A single event loop and client cover font bootstrap and media downloads.
+        async with _make_async_client(args.concurrency) as client:
+            font_faces = await _ensure_fonts(client, font_dir)
+
+            print("[3/6] Reading CSV and preparing rows...")
+            rows = _read_rows(csv_path)
+            rows = _filter_rows(rows, start_d, end_d)
+            rows.sort(key=attrgetter("created_at"), reverse=(args.sort == "desc"))
+            print(f"Tweets in output scope: {len(rows)}")
+
+            await _download_media(
+                client,
+                rows=rows,
+                media_cache_dir=media_cache,
+                exact_hosts=exact_hosts,
+                host_suffixes=host_suffixes,
+                concurrency=args.concurrency,
+            )
+        return font_faces, rows
 
-    _download_media(
-        rows=rows,
-        media_cache_dir=media_cache,
-        allow_hosts=allow_hosts,
-        concurrency=args.concurrency,
-    )
+    font_faces, rows = asyncio.run(_run_all())
 
     out_pdf.parent.mkdir(parents=True, exist_ok=True)
     _render_pdf(rows=rows, out_pdf=out_pdf, template_dir=template_dir, font_faces=font_faces)